@@ -1,17 +1,40 @@
 import os
 import math
-from datetime import datetime, date, timedelta
+import time
+from functools import lru_cache
+from datetime import date, timedelta
 
+import orjson
 from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask.json.provider import JSONProvider, DefaultJSONProvider
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
+from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError, InvalidHashError
 
 
 # =========================
 # App config
 # =========================
+# JSON via orjson (jsonify, session); output sama dengan provider default Flask:
+# key diurutkan, date/datetime lewat fallback Flask (format HTTP-date)
+class ORJSONProvider(JSONProvider):
+    sort_keys = True
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get("sort_keys", self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=DefaultJSONProvider.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "ganti-secret-acak-yang-panjang")
 
 DB_URL = os.getenv("DATABASE_URL", "sqlite:///farm.db")
@@ -19,14 +42,33 @@ app.config["SQLALCHEMY_DATABASE_URI"] = DB_URL
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
 # (opsional) bantu SQLite di environment multi-thread (tetap 1 writer at a time)
+# pool default (QueuePool) sudah mempertahankan koneksi seumur proses -> page cache SQLite tetap "panas"
 if DB_URL.startswith("sqlite"):
     app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"connect_args": {"check_same_thread": False}}
 
 db = SQLAlchemy(app)
 
+# SQLite: WAL + fsync lebih ringan + cache halaman lebih besar, per koneksi baru
+if DB_URL.startswith("sqlite"):
+    def _sqlite_pragmas(dbapi_conn, _conn_record):
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
+        cur.execute("PRAGMA temp_store=MEMORY")
+        cur.execute("PRAGMA mmap_size=268435456")  # 256 MB
+        cur.execute("PRAGMA cache_size=-65536")    # 64 MB
+        cur.close()
+
+    with app.app_context():
+        event.listen(db.engine, "connect", _sqlite_pragmas)
+
 login_manager = LoginManager(app)
 login_manager.login_view = "login"
 
+# argon2id dengan biaya terbatas (~30-50ms/login); hash werkzeug lama (scrypt/pbkdf2) tetap bisa login
+# lalu di-upgrade otomatis saat login berhasil
+_ph = PasswordHasher(time_cost=2, memory_cost=19456, parallelism=1)
+
 
 # =========================
 # Models
@@ -38,10 +80,20 @@ class User(UserMixin, db.Model):
     role = db.Column(db.String(20), default="admin")
 
     def set_password(self, pw: str):
-        self.password_hash = generate_password_hash(pw)
+        self.password_hash = _ph.hash(pw)
 
     def check_password(self, pw: str) -> bool:
-        return check_password_hash(self.password_hash, pw)
+        if not self.password_hash.startswith("$argon2"):
+            return check_password_hash(self.password_hash, pw)  # hash werkzeug lama
+        try:
+            return _ph.verify(self.password_hash, pw)
+        except (VerificationError, InvalidHashError):
+            return False
+
+    def needs_rehash(self) -> bool:
+        if not self.password_hash.startswith("$argon2"):
+            return True
+        return _ph.check_needs_rehash(self.password_hash)
 
 
 class Setting(db.Model):
@@ -69,6 +121,15 @@ class Transaction(db.Model):
 
     product = db.relationship("Product")
 
+    __table_args__ = (db.Index("ix_tx_tipe_prod_tgl", "tipe", "product_id", "tgl"),)
+
+
+# kolam bulat -> (volume m³, kapasitas ekor, kapasitas kg)
+def pond_capacity(diameter_m, water_depth_m, stocking_rate, biomass_rate):
+    r = (diameter_m or 0) / 2.0
+    vol = math.pi * (r ** 2) * (water_depth_m or 0)
+    return vol, int(round(vol * (stocking_rate or 0))), float(vol * (biomass_rate or 0))
+
 
 class Pond(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -83,22 +144,35 @@ class Pond(db.Model):
     stocking_rate_fish_per_m3 = db.Column(db.Float, default=150.0)   # ekor / m³
     biomass_capacity_kg_per_m3 = db.Column(db.Float, default=10.0)   # kg / m³
 
-    def volume_m3(self) -> float:
-        r = (self.diameter_m or 0) / 2.0
-        h = (self.water_depth_m or 0)
-        return math.pi * (r ** 2) * h
+    # turunan, dihitung otomatis saat insert/update (lihat listener di bawah)
+    volume_m3 = db.Column(db.Float)
+    cap_fish_count = db.Column(db.Integer)
+    cap_biomass_kg = db.Column(db.Float)
+
+    def update_capacity(self):
+        self.volume_m3, self.cap_fish_count, self.cap_biomass_kg = pond_capacity(
+            self.diameter_m, self.water_depth_m,
+            self.stocking_rate_fish_per_m3, self.biomass_capacity_kg_per_m3
+        )
 
-    def capacity_fish_count(self) -> int:
-        return int(round(self.volume_m3() * (self.stocking_rate_fish_per_m3 or 0)))
 
-    def capacity_biomass_kg(self) -> float:
-        return float(self.volume_m3() * (self.biomass_capacity_kg_per_m3 or 0))
+@event.listens_for(Pond, "before_insert")
+def _pond_before_insert(mapper, connection, target):
+    # default kolom baru diisi saat INSERT -> isi dulu supaya kapasitas tidak 0
+    for name in ("diameter_m", "water_depth_m", "stocking_rate_fish_per_m3", "biomass_capacity_kg_per_m3"):
+        if getattr(target, name) is None:
+            setattr(target, name, mapper.columns[name].default.arg)
+    target.update_capacity()
+
+@event.listens_for(Pond, "before_update")
+def _pond_before_update(mapper, connection, target):
+    target.update_capacity()
 
 
 class FishEvent(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     pond_id = db.Column(db.Integer, db.ForeignKey("pond.id"), nullable=False)
-    tgl = db.Column(db.Integer, nullable=False, default=lambda: int(date.today().strftime("%Y%m%d")))
+    tgl = db.Column(db.Integer, nullable=False, default=lambda: to_ymd_int(date.today()))
     # STOCK / HARVEST / MORTALITY
     event_type = db.Column(db.String(12), nullable=False)
     count = db.Column(db.Integer, default=0)        # ekor
@@ -107,10 +181,11 @@ class FishEvent(db.Model):
 
     pond = db.relationship("Pond")
 
+    __table_args__ = (db.Index("ix_fe_pond_type", "pond_id", "event_type"),)
+
     @property
     def tgl_date(self) -> date:
-        s = str(self.tgl)
-        return date(int(s[0:4]), int(s[4:6]), int(s[6:8]))
+        return from_ymd_int(self.tgl)
 
 
 class Flock(db.Model):
@@ -123,13 +198,27 @@ class Flock(db.Model):
 class ChickenDailyLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     flock_id = db.Column(db.Integer, db.ForeignKey("flock.id"), nullable=False)
-    tgl = db.Column(db.Date, nullable=False, default=date.today)
+    tgl = db.Column(db.Integer, nullable=False, default=lambda: to_ymd_int(date.today()))
     eggs_count = db.Column(db.Integer, default=0)   # butir
     dead_count = db.Column(db.Integer, default=0)
     note = db.Column(db.String(200), default="")
 
     flock = db.relationship("Flock")
 
+    __table_args__ = (db.Index("ix_cdl_flock_tgl", "flock_id", "tgl"),)
+
+    @property
+    def tgl_date(self) -> date:
+        return from_ymd_int(self.tgl)
+
+
+# akumulasi transaksi IN/OUT, diperbarui bersama setiap transaksi baru
+class Totals(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(50), unique=True, nullable=False)
+    value_in = db.Column(db.Float, nullable=False, default=0.0)
+    value_out = db.Column(db.Float, nullable=False, default=0.0)
+
 
 @login_manager.user_loader
 def load_user(user_id):
@@ -140,13 +229,24 @@ def load_user(user_id):
 # Helpers
 # =========================
 def parse_date(s: str):
-    if not s:
+    # format tetap YYYY-MM-DD (input type=date) -> slicing, tanpa strptime
+    # (int() menerima tanda +/- dan spasi, jadi cek digit dulu)
+    if not s or len(s) != 10 or s[4] != "-" or s[7] != "-":
+        return None
+    if not (s[0:4].isdigit() and s[5:7].isdigit() and s[8:10].isdigit()):
         return None
     try:
-        return datetime.strptime(s, "%Y-%m-%d").date()
+        return date(int(s[0:4]), int(s[5:7]), int(s[8:10]))
     except ValueError:
         return None
 
+# tanggal <-> integer YYYYMMDD (kolom tgl FishEvent / ChickenDailyLog)
+def to_ymd_int(d: date) -> int:
+    return d.year * 10000 + d.month * 100 + d.day
+
+def from_ymd_int(t: int) -> date:
+    return date(t // 10000, (t // 100) % 100, t % 100)
+
 def parse_int(s, default=0):
     try:
         return int(float(s))
@@ -159,9 +259,41 @@ def parse_float(s, default=0.0):
     except Exception:
         return default
 
+_SETTINGS_CACHE: dict[str, str] = {}
+
 def get_setting(key: str, default: str):
+    if key in _SETTINGS_CACHE:
+        return _SETTINGS_CACHE[key]
     s = Setting.query.filter_by(key=key).first()
-    return s.value if s else default
+    if not s:
+        return default
+    _SETTINGS_CACHE[key] = s.value
+    return s.value
+
+_TELUR_ID = None
+
+def get_telur_id():
+    # id produk "Telur" tidak berubah setelah seed -> cukup dicari sekali
+    global _TELUR_ID
+    if _TELUR_ID is None:
+        p = Product.query.filter_by(name="Telur").first()
+        if not p:
+            return 0
+        _TELUR_ID = p.id
+    return _TELUR_ID
+
+def sum_transactions():
+    return db.session.query(
+        db.func.coalesce(db.func.sum(db.case((Transaction.tipe == "IN", Transaction.total), else_=0.0)), 0.0),
+        db.func.coalesce(db.func.sum(db.case((Transaction.tipe == "OUT", Transaction.total), else_=0.0)), 0.0),
+    ).one()
+
+def get_totals():
+    # (pemasukan, pengeluaran); baris Totals dibuat oleh migrate_db, kalau belum ada hitung ulang (read-only)
+    t = Totals.query.filter_by(key="transactions").first()
+    if not t:
+        return sum_transactions()
+    return t.value_in, t.value_out
 
 def set_setting(key: str, value: str):
     s = Setting.query.filter_by(key=key).first()
@@ -175,15 +307,57 @@ def set_setting(key: str, value: str):
 # =========================
 # Init command
 # =========================
+# skema + upgrade DB lama; dipanggil dari init-db dan saat start (python app.py)
+def migrate_db():
+    db.create_all()
+
+    # create_all tidak menambah index ke tabel yang sudah ada (DB lama)
+    for model in (Transaction, ChickenDailyLog, FishEvent):
+        for ix in model.__table__.indexes:
+            ix.create(db.engine, checkfirst=True)
+
+    # DB lama (SQLite): tgl log ayam 'YYYY-MM-DD' -> integer YYYYMMDD
+    if DB_URL.startswith("sqlite"):
+        db.session.execute(db.text(
+            "UPDATE chicken_daily_log SET tgl = CAST(REPLACE(tgl, '-', '') AS INTEGER) "
+            "WHERE typeof(tgl) = 'text'"
+        ))
+
+    # kolom turunan kolam untuk DB lama
+    pond_cols = {c["name"] for c in db.inspect(db.engine).get_columns("pond")}
+    missing = [c for c in ("volume_m3", "cap_fish_count", "cap_biomass_kg") if c not in pond_cols]
+    for name in missing:
+        col_type = Pond.__table__.c[name].type.compile(db.engine.dialect)
+        db.session.execute(db.text(f"ALTER TABLE pond ADD COLUMN {name} {col_type}"))
+    # 1 SELECT kolom + 1 bulk UPDATE, tanpa hidrasi objek Pond
+    rows = []
+    for pond_id, d, h, rate, bio in db.session.query(
+        Pond.id, Pond.diameter_m, Pond.water_depth_m,
+        Pond.stocking_rate_fish_per_m3, Pond.biomass_capacity_kg_per_m3
+    ).filter(Pond.volume_m3.is_(None)).all():
+        vol, cap_fish, cap_kg = pond_capacity(d, h, rate, bio)
+        rows.append({"id": pond_id, "volume_m3": vol, "cap_fish_count": cap_fish, "cap_biomass_kg": cap_kg})
+    if rows:
+        db.session.execute(db.update(Pond), rows)
+
+    # baris akumulasi untuk /api/summary, diisi dari transaksi yang sudah ada
+    if not Totals.query.filter_by(key="transactions").first():
+        value_in, value_out = sum_transactions()
+        db.session.add(Totals(key="transactions", value_in=value_in, value_out=value_out))
+
+    db.session.commit()
+
+
 @app.cli.command("init-db")
 def init_db():
-    db.create_all()
+    migrate_db()
 
     # Seed products
     seeds = [("Telur", "rak"), ("Ikan Nila", "kg"), ("Umum", "unit")]
-    for name, unit in seeds:
-        if not Product.query.filter_by(name=name).first():
-            db.session.add(Product(name=name, default_unit=unit))
+    existing = {name for (name,) in db.session.query(Product.name).all()}
+    new_products = [{"name": name, "default_unit": unit} for name, unit in seeds if name not in existing]
+    if new_products:
+        db.session.execute(db.insert(Product), new_products)
 
     # Default setting: 30 butir / rak
     if not Setting.query.filter_by(key="EGGS_PER_RACK").first():
@@ -196,19 +370,22 @@ def init_db():
         db.session.add(u)
 
     # Seed 6 kolam bulat kalau belum ada
-    if Pond.query.count() == 0:
-        for i in range(1, 7):
-            db.session.add(Pond(
-                name=f"Kolam {i}",
-                shape="circular",
-                diameter_m=3.0,
-                water_depth_m=1.0,
-                stocking_rate_fish_per_m3=150.0,
-                biomass_capacity_kg_per_m3=10.0
-            ))
+    if db.session.query(Pond.id).first() is None:
+        vol, cap_fish, cap_kg = pond_capacity(3.0, 1.0, 150.0, 10.0)
+        db.session.execute(db.insert(Pond), [{
+            "name": f"Kolam {i}",
+            "shape": "circular",
+            "diameter_m": 3.0,
+            "water_depth_m": 1.0,
+            "stocking_rate_fish_per_m3": 150.0,
+            "biomass_capacity_kg_per_m3": 10.0,
+            "volume_m3": vol,
+            "cap_fish_count": cap_fish,
+            "cap_biomass_kg": cap_kg,
+        } for i in range(1, 7)])
 
     # Seed 1 flok default
-    if Flock.query.count() == 0:
+    if db.session.query(Flock.id).first() is None:
         db.session.add(Flock(name="Flok 1", initial_count=0))
 
     db.session.commit()
@@ -232,6 +409,9 @@ def login_post():
     if not u or not u.check_password(password):
         flash("Login gagal. Cek username/password.", "danger")
         return redirect(url_for("login"))
+    if u.needs_rehash():
+        u.set_password(password)
+        db.session.commit()
     login_user(u)
     return redirect(url_for("dashboard"))
 
@@ -249,73 +429,90 @@ def logout():
 def home():
     return redirect(url_for("dashboard"))
 
-@app.get("/dashboard")
-@login_required
-def dashboard():
-    today = date.today()
-    start_7d = today - timedelta(days=6)
+# cache agregat dashboard: kunci = hari ini + slot TTL + MAX(id) tabel log.
+# Insert baru mengubah sentinel; route tulis lain memanggil cache_clear().
+DASHBOARD_CACHE_TTL = 60  # detik
+
+def _dashboard_sentinels():
+    return db.session.query(
+        db.session.query(db.func.max(Transaction.id)).scalar_subquery(),
+        db.session.query(db.func.max(ChickenDailyLog.id)).scalar_subquery(),
+        db.session.query(db.func.max(FishEvent.id)).scalar_subquery(),
+    ).one()
 
-    # totals
-    total_in = db.session.query(db.func.coalesce(db.func.sum(Transaction.total), 0.0))\
-        .filter(Transaction.tipe == "IN").scalar()
-    total_out = db.session.query(db.func.coalesce(db.func.sum(Transaction.total), 0.0))\
-        .filter(Transaction.tipe == "OUT").scalar()
-    profit = (total_in or 0) - (total_out or 0)
+@lru_cache(maxsize=8)
+def _dashboard_payload(today, ttl_slot, tx_sentinel, cdl_sentinel, fe_sentinel):
+    start_7d = today - timedelta(days=6)
 
     # eggs per rack
     eggs_per_rack = parse_int(get_setting("EGGS_PER_RACK", "30"), 30)
 
-    telur = Product.query.filter_by(name="Telur").first()
-
-    # total produksi telur (butir)
-    eggs_produced = db.session.query(db.func.coalesce(db.func.sum(ChickenDailyLog.eggs_count), 0)).scalar()
+    telur_id = get_telur_id()
 
-    # total telur terjual (rak) dari transaksi IN
-    racks_sold = 0.0
-    if telur:
-        racks_sold = db.session.query(db.func.coalesce(db.func.sum(Transaction.qty), 0.0))\
-            .filter(Transaction.tipe == "IN", Transaction.product_id == telur.id).scalar()
-
-    eggs_sold = int(round((racks_sold or 0) * eggs_per_rack))
-    eggs_stock_raw = int((eggs_produced or 0) - eggs_sold)
+    # chicken current (flok pertama)
+    flock = Flock.query.order_by(Flock.id.asc()).first()
+    flock_id = flock.id if flock else 0
+
+    # lambda_stmt: SQL di-compile sekali per lambda, variabel closure (telur_id, today, ...)
+    # jadi bind parameter -> request berikutnya tidak membangun/compile ulang statement
+
+    # totals + telur terjual (rak) dari transaksi IN -> 1 query
+    total_in, total_out, racks_sold, racks_sold_today = db.session.execute(db.lambda_stmt(lambda: db.select(
+        db.func.coalesce(db.func.sum(db.case((Transaction.tipe == "IN", Transaction.total), else_=0.0)), 0.0),
+        db.func.coalesce(db.func.sum(db.case((Transaction.tipe == "OUT", Transaction.total), else_=0.0)), 0.0),
+        db.func.coalesce(db.func.sum(db.case(
+            (db.and_(Transaction.tipe == "IN", Transaction.product_id == telur_id), Transaction.qty), else_=0.0
+        )), 0.0),
+        db.func.coalesce(db.func.sum(db.case(
+            (db.and_(Transaction.tipe == "IN", Transaction.product_id == telur_id, Transaction.tgl == today), Transaction.qty),
+            else_=0.0
+        )), 0.0),
+    ))).one()
+    profit = total_in - total_out
+
+    # produksi telur (semua flok) + metrik flok pertama -> 1 query
+    today_int = to_ymd_int(today)
+    start_7d_int = to_ymd_int(start_7d)
+    eggs_produced, dead_all, eggs_today, dead_today, eggs_7d, dead_7d = db.session.execute(db.lambda_stmt(lambda: db.select(
+        db.func.coalesce(db.func.sum(ChickenDailyLog.eggs_count), 0),
+        db.func.coalesce(db.func.sum(db.case(
+            (ChickenDailyLog.flock_id == flock_id, ChickenDailyLog.dead_count), else_=0
+        )), 0),
+        db.func.coalesce(db.func.sum(db.case(
+            (db.and_(ChickenDailyLog.flock_id == flock_id, ChickenDailyLog.tgl == today_int), ChickenDailyLog.eggs_count),
+            else_=0
+        )), 0),
+        db.func.coalesce(db.func.sum(db.case(
+            (db.and_(ChickenDailyLog.flock_id == flock_id, ChickenDailyLog.tgl == today_int), ChickenDailyLog.dead_count),
+            else_=0
+        )), 0),
+        db.func.coalesce(db.func.sum(db.case(
+            (db.and_(ChickenDailyLog.flock_id == flock_id, ChickenDailyLog.tgl.between(start_7d_int, today_int)),
+             ChickenDailyLog.eggs_count),
+            else_=0
+        )), 0),
+        db.func.coalesce(db.func.sum(db.case(
+            (db.and_(ChickenDailyLog.flock_id == flock_id, ChickenDailyLog.tgl.between(start_7d_int, today_int)),
+             ChickenDailyLog.dead_count),
+            else_=0
+        )), 0),
+    ))).one()
+
+    eggs_sold = int(round(racks_sold * eggs_per_rack))
+    eggs_stock_raw = eggs_produced - eggs_sold
     stock_warning = eggs_stock_raw < 0
     eggs_stock = max(0, eggs_stock_raw)
 
     stock_racks = eggs_stock // eggs_per_rack if eggs_per_rack > 0 else 0
     stock_eggs_rem = eggs_stock % eggs_per_rack if eggs_per_rack > 0 else eggs_stock
 
-    # chicken current (flok pertama)
-    flock = Flock.query.order_by(Flock.id.asc()).first()
     chicken_current_raw = 0
     if flock:
-        dead_all = db.session.query(db.func.coalesce(db.func.sum(ChickenDailyLog.dead_count), 0))\
-            .filter(ChickenDailyLog.flock_id == flock.id).scalar()
-        chicken_current_raw = int((flock.initial_count or 0) - (dead_all or 0))
+        chicken_current_raw = (flock.initial_count or 0) - dead_all
     chicken_warning = chicken_current_raw < 0
     chicken_current = max(0, chicken_current_raw)
 
     # ========= metrik harian & 7 hari (TELUR & AYAM) =========
-    eggs_today = 0
-    dead_today = 0
-    eggs_7d = 0
-    dead_7d = 0
-
-    if flock:
-        eggs_today = db.session.query(db.func.coalesce(db.func.sum(ChickenDailyLog.eggs_count), 0))\
-            .filter(ChickenDailyLog.flock_id == flock.id, ChickenDailyLog.tgl == today).scalar()
-        dead_today = db.session.query(db.func.coalesce(db.func.sum(ChickenDailyLog.dead_count), 0))\
-            .filter(ChickenDailyLog.flock_id == flock.id, ChickenDailyLog.tgl == today).scalar()
-
-        eggs_7d = db.session.query(db.func.coalesce(db.func.sum(ChickenDailyLog.eggs_count), 0))\
-            .filter(ChickenDailyLog.flock_id == flock.id, ChickenDailyLog.tgl >= start_7d, ChickenDailyLog.tgl <= today).scalar()
-        dead_7d = db.session.query(db.func.coalesce(db.func.sum(ChickenDailyLog.dead_count), 0))\
-            .filter(ChickenDailyLog.flock_id == flock.id, ChickenDailyLog.tgl >= start_7d, ChickenDailyLog.tgl <= today).scalar()
-
-    eggs_today = int(eggs_today or 0)
-    dead_today = int(dead_today or 0)
-    eggs_7d = int(eggs_7d or 0)
-    dead_7d = int(dead_7d or 0)
-
     avg_eggs_7d = round(eggs_7d / 7.0, 1)
 
     # Hen-Day Egg Production (HDEP): (telur hari ini / jumlah ayam hari ini) * 100
@@ -328,33 +525,30 @@ def dashboard():
     if chicken_current > 0:
         mortality_7d_pct = round((dead_7d / chicken_current) * 100.0, 2)
 
-    # telur terjual hari ini (rak) dari transaksi IN
-    racks_sold_today = 0.0
-    if telur:
-        racks_sold_today = db.session.query(db.func.coalesce(db.func.sum(Transaction.qty), 0.0))\
-            .filter(Transaction.tipe == "IN", Transaction.product_id == telur.id, Transaction.tgl == today).scalar()
-    racks_sold_today = float(racks_sold_today or 0.0)
+    # telur terjual hari ini (rak)
     eggs_sold_today = int(round(racks_sold_today * eggs_per_rack))
 
-    # ponds occupancy
+    # ponds occupancy: 1 query GROUP BY pond_id, pivot STOCK/HARVEST/MORTALITY di SQL
+    pond_agg = {r.pond_id: r for r in db.session.execute(db.lambda_stmt(lambda: db.select(
+        FishEvent.pond_id,
+        db.func.sum(db.case((FishEvent.event_type == "STOCK", FishEvent.count), else_=0)).label("stocked"),
+        db.func.sum(db.case((FishEvent.event_type == "HARVEST", FishEvent.count), else_=0)).label("harv"),
+        db.func.sum(db.case((FishEvent.event_type == "MORTALITY", FishEvent.count), else_=0)).label("dead"),
+    ).group_by(FishEvent.pond_id)))}
+
     ponds = Pond.query.order_by(Pond.id.asc()).all()
     pond_cards = []
     for p in ponds:
-        stocked = db.session.query(db.func.coalesce(db.func.sum(FishEvent.count), 0))\
-            .filter(FishEvent.pond_id == p.id, FishEvent.event_type == "STOCK").scalar()
-        harvested = db.session.query(db.func.coalesce(db.func.sum(FishEvent.count), 0))\
-            .filter(FishEvent.pond_id == p.id, FishEvent.event_type == "HARVEST").scalar()
-        dead = db.session.query(db.func.coalesce(db.func.sum(FishEvent.count), 0))\
-            .filter(FishEvent.pond_id == p.id, FishEvent.event_type == "MORTALITY").scalar()
-        current = int((stocked or 0) - (harvested or 0) - (dead or 0))
-
-        cap_fish = p.capacity_fish_count()
-        cap_kg = p.capacity_biomass_kg()
-        vol = round(p.volume_m3(), 2)
+        agg = pond_agg.get(p.id)
+        current = int((agg.stocked or 0) - (agg.harv or 0) - (agg.dead or 0)) if agg else 0
+
+        cap_fish = p.cap_fish_count
+        cap_kg = p.cap_biomass_kg
+        vol = round(p.volume_m3, 2)
 
         usage = 0 if cap_fish <= 0 else round(current / cap_fish * 100, 1)
         pond_cards.append({
-            "pond": p,
+            "pond": {"id": p.id, "name": p.name},
             "current": current,
             "cap_fish": cap_fish,
             "cap_kg": round(cap_kg, 2),
@@ -362,15 +556,14 @@ def dashboard():
             "usage": usage
         })
 
-    return render_template(
-        "dashboard.html",
-        total_in=total_in or 0,
-        total_out=total_out or 0,
+    return dict(
+        total_in=total_in,
+        total_out=total_out,
         profit=profit,
 
         eggs_per_rack=eggs_per_rack,
-        eggs_produced=eggs_produced or 0,
-        racks_sold=racks_sold or 0,
+        eggs_produced=eggs_produced,
+        racks_sold=racks_sold,
         eggs_sold=eggs_sold,
         eggs_stock=eggs_stock,
         eggs_stock_raw=eggs_stock_raw,
@@ -396,6 +589,14 @@ def dashboard():
         pond_cards=pond_cards
     )
 
+@app.get("/dashboard")
+@login_required
+def dashboard():
+    payload = _dashboard_payload(
+        date.today(), int(time.monotonic() // DASHBOARD_CACHE_TTL), *_dashboard_sentinels()
+    )
+    return render_template("dashboard.html", **payload)
+
 
 @app.get("/settings")
 @login_required
@@ -413,6 +614,8 @@ def settings_save():
         return redirect(url_for("settings"))
     set_setting("EGGS_PER_RACK", str(eggs_per_rack_int))
     db.session.commit()
+    _SETTINGS_CACHE["EGGS_PER_RACK"] = str(eggs_per_rack_int)  # hanya setelah commit berhasil
+    _dashboard_payload.cache_clear()
     flash("✅ Setting tersimpan.", "success")
     return redirect(url_for("settings"))
 
@@ -424,7 +627,11 @@ def transactions():
     q_type = request.args.get("tipe", "")
     q_product = request.args.get("product_id", "")
 
-    query = Transaction.query
+    # hanya kolom yang ditampilkan -> tuple, tanpa hidrasi objek ORM
+    query = db.session.query(
+        Transaction.id, Transaction.tgl, Transaction.tipe, Product.name.label("product_name"),
+        Transaction.deskripsi, Transaction.qty, Transaction.unit, Transaction.unit_price, Transaction.total
+    ).outerjoin(Product, Product.id == Transaction.product_id)
     if q_type in ("IN", "OUT"):
         query = query.filter(Transaction.tipe == q_type)
     if q_product.isdigit():
@@ -453,7 +660,15 @@ def transactions_add():
         tgl=tgl, tipe=tipe, product_id=product_id, deskripsi=deskripsi,
         qty=qty, unit=unit, unit_price=unit_price, total=total
     ))
+    # UPDATE ... SET value_in = value_in + ? (atomik, commit bersama transaksi)
+    if tipe in ("IN", "OUT"):
+        col = "value_in" if tipe == "IN" else "value_out"
+        db.session.execute(
+            db.update(Totals).where(Totals.key == "transactions")
+            .values({col: getattr(Totals, col) + total})
+        )
     db.session.commit()
+    _dashboard_payload.cache_clear()
     flash("✅ Transaksi tersimpan.", "success")
     return redirect(url_for("transactions"))
 
@@ -486,6 +701,7 @@ def pond_update(pond_id):
     p.biomass_capacity_kg_per_m3 = parse_float(request.form.get("biomass_capacity_kg_per_m3"), p.biomass_capacity_kg_per_m3)
 
     db.session.commit()
+    _dashboard_payload.cache_clear()
     flash("✅ Data kolam diperbarui.", "success")
     return redirect(url_for("pond_detail", pond_id=pond_id))
 
@@ -497,7 +713,7 @@ def pond_add_event(pond_id):
         return "Not found", 404
 
     tgl = parse_date(request.form.get("tgl")) or date.today()
-    tgl_int = int(tgl.strftime("%Y%m%d"))
+    tgl_int = to_ymd_int(tgl)
     event_type = request.form.get("event_type", "STOCK")
     count = parse_int(request.form.get("count"), 0)
     weight_kg = parse_float(request.form.get("weight_kg"), 0.0)
@@ -508,6 +724,7 @@ def pond_add_event(pond_id):
         count=count, weight_kg=weight_kg, note=note
     ))
     db.session.commit()
+    _dashboard_payload.cache_clear()
     flash("✅ Event ikan tersimpan.", "success")
     return redirect(url_for("pond_detail", pond_id=pond_id))
 
@@ -526,6 +743,7 @@ def flocks_update(flock_id):
         return "Not found", 404
     f.initial_count = parse_int(request.form.get("initial_count"), f.initial_count)
     db.session.commit()
+    _dashboard_payload.cache_clear()
     flash("✅ Jumlah awal flok diperbarui.", "success")
     return redirect(url_for("flocks"))
 
@@ -546,14 +764,16 @@ def flock_add_log(flock_id):
         return "Not found", 404
 
     tgl = parse_date(request.form.get("tgl")) or date.today()
+    tgl_int = to_ymd_int(tgl)
     eggs = parse_int(request.form.get("eggs_count"), 0)
     dead = parse_int(request.form.get("dead_count"), 0)
     note = request.form.get("note", "")
 
     db.session.add(ChickenDailyLog(
-        flock_id=flock_id, tgl=tgl, eggs_count=eggs, dead_count=dead, note=note
+        flock_id=flock_id, tgl=tgl_int, eggs_count=eggs, dead_count=dead, note=note
     ))
     db.session.commit()
+    _dashboard_payload.cache_clear()
     flash("✅ Log harian tersimpan.", "success")
     return redirect(url_for("flock_detail", flock_id=flock_id))
 
@@ -561,18 +781,15 @@ def flock_add_log(flock_id):
 @app.get("/api/summary")
 @login_required
 def api_summary():
-    total_in = db.session.query(db.func.coalesce(db.func.sum(Transaction.total), 0.0))\
-        .filter(Transaction.tipe == "IN").scalar()
-    total_out = db.session.query(db.func.coalesce(db.func.sum(Transaction.total), 0.0))\
-        .filter(Transaction.tipe == "OUT").scalar()
+    total_in, total_out = get_totals()
     return jsonify({
-        "income": float(total_in or 0),
-        "expense": float(total_out or 0),
-        "profit": float((total_in or 0) - (total_out or 0))
+        "income": float(total_in),
+        "expense": float(total_out),
+        "profit": float(total_in - total_out)
     })
 
 
 if __name__ == "__main__":
     with app.app_context():
-        db.create_all()
+        migrate_db()
     app.run(host="127.0.0.1", port=5000, debug=False)